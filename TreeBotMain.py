@@ -1,14 +1,24 @@
 import asyncio
+import cProfile
+import heapq
+import io
 import json
 import logging
+import math
+import os
+import pstats
 import random
+import sys
 import time
-from collections import deque
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque
 from datetime import datetime
 import aiohttp
 import discord
 from discord.ext import commands, tasks
 from discord.ui import Button, View
+from gateway import build_gateway_options
 
 def get_bot_token():
     try:
@@ -27,7 +37,16 @@ config = {
     "TOPIC_COOLDOWN_HOURS": 2,
     "TOPICS_FILE": "topics.txt",
     "BUTTON_STATS": {},
-    "TOPIC_STATS": {}
+    "TOPIC_STATS": {},
+    "BUTTON_STATS_FILE": "button_stats.bin",
+    "TOPIC_STATS_FILE": "topic_stats.bin",
+    "STATS_FLUSH_SECONDS": 60,  # Stats are written this often and on shutdown; a crash loses at most this window
+    "SNAPSHOT_FILE": "snapshot.json",
+    "WORKER_COUNT": 4,
+    "WORK_QUEUE_SIZE": 100,
+    "WORK_QUEUE_TIMEOUT_SECONDS": 5,
+    "LEAN_GATEWAY": False,  # Minimal intents, no member chunking and no message cache
+    "CACHE_MEMBERS": False  # Only used in lean mode; caches members as they show up instead of chunking
 }
 
 ACTIVITIES = [
@@ -47,29 +66,219 @@ async def switch_activity():
     activity = random.choice(ACTIVITIES)
     await bot.change_presence(activity=activity)
 
-def save_config():
+# Per-user counters in sorted id/count arrays, with a pending dict for new ids and a cache of the top counts
+class CounterStore:
+    MAGIC = b"TBCS"
+    MERGE_THRESHOLD = 1024
+    TOP_CACHE_SIZE = 1000
+
+    def __init__(self):
+        self.ids = array('q')
+        self.counts = array('q')
+        self.pending = {}
+        self.dirty = False
+        # Every count outside self.top is <= top_floor; None means self.top holds every entry
+        self.top = None
+        self.top_floor = None
+
+    @classmethod
+    def from_dict(cls, stats: dict):
+        store = cls()
+        for user_id, count in sorted((int(k), v) for k, v in stats.items()):
+            store.ids.append(user_id)
+            store.counts.append(count)
+        store.dirty = True
+        return store
+
+    @classmethod
+    def load(cls, path: str):
+        store = cls()
+        with open(path, 'rb') as f:
+            if f.read(4) != cls.MAGIC:
+                raise ValueError(f"{path} is not a counter store file")
+            header = f.read(8)
+            if len(header) != 8:
+                raise EOFError(f"{path} is truncated")
+            size = int.from_bytes(header, "little")
+            store.ids.fromfile(f, size)
+            store.counts.fromfile(f, size)
+        if sys.byteorder == "big":
+            store.ids.byteswap()
+            store.counts.byteswap()
+        return store
+
+    def save(self, path: str):
+        self.merge()
+        ids, counts = self.ids, self.counts
+        if sys.byteorder == "big":
+            ids, counts = array('q', ids), array('q', counts)
+            ids.byteswap()
+            counts.byteswap()
+
+        temp_file = path + ".tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(self.MAGIC)
+            f.write(len(ids).to_bytes(8, "little"))
+            ids.tofile(f)
+            counts.tofile(f)
+        os.replace(temp_file, path)
+        self.dirty = False
+
+    def _index(self, user_id: int) -> int:
+        idx = bisect_left(self.ids, user_id)
+        if idx < len(self.ids) and self.ids[idx] == user_id:
+            return idx
+        return -1
+
+    def merge(self):
+        if not self.pending:
+            return
+
+        ids, counts = array('q'), array('q')
+        start = 0
+        for user_id, count in sorted(self.pending.items()):
+            idx = bisect_left(self.ids, user_id, start)
+            ids.extend(self.ids[start:idx])
+            counts.extend(self.counts[start:idx])
+            ids.append(user_id)
+            counts.append(count)
+            start = idx
+        ids.extend(self.ids[start:])
+        counts.extend(self.counts[start:])
+
+        self.ids, self.counts = ids, counts
+        self.pending = {}
+
+    def get(self, user_id: int, default=None):
+        if user_id in self.pending:
+            return self.pending[user_id]
+        idx = self._index(user_id)
+        return self.counts[idx] if idx >= 0 else default
+
+    def __getitem__(self, user_id: int) -> int:
+        if user_id in self.pending:
+            return self.pending[user_id]
+        idx = self._index(user_id)
+        if idx < 0:
+            raise KeyError(user_id)
+        return self.counts[idx]
+
+    def __setitem__(self, user_id: int, count: int):
+        self.dirty = True
+        self._update_top(user_id, count)
+
+        idx = self._index(user_id)
+        if idx >= 0:
+            self.counts[idx] = count
+            return
+
+        self.pending[user_id] = count
+        if len(self.pending) >= self.MERGE_THRESHOLD:
+            self.merge()
+
+    def _update_top(self, user_id: int, count: int):
+        if self.top is None:
+            return
+
+        if user_id in self.top:
+            if count < self.top[user_id]:
+                # Something below the cache might now outrank it
+                self.top = None
+                return
+            self.top[user_id] = count
+        elif self.top_floor is None or count > self.top_floor:
+            self.top[user_id] = count
+            if len(self.top) > self.TOP_CACHE_SIZE:
+                del self.top[min(self.top, key=self.top.__getitem__)]
+                self.top_floor = min(self.top.values())
+
+    def __contains__(self, user_id) -> bool:
+        return user_id in self.pending or self._index(user_id) >= 0
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.pending)
+
+    def __iter__(self):
+        self.merge()
+        return iter(self.ids)
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        self.merge()
+        return list(zip(self.ids, self.counts))
+
+    def rebuild_top(self):
+        self.merge()
+        top = heapq.nlargest(self.TOP_CACHE_SIZE, range(len(self.counts)), key=self.counts.__getitem__)
+        self.top = {self.ids[idx]: self.counts[idx] for idx in top}
+        self.top_floor = min(self.top.values()) if len(self) > len(self.top) else None
+
+    def top_k(self, k: int) -> list[tuple[int, int]]:
+        if self.top is None:
+            self.rebuild_top()
+
+        if k > len(self.top) and self.top_floor is not None:
+            self.merge()
+            top = heapq.nlargest(k, range(len(self.counts)), key=self.counts.__getitem__)
+            return [(self.ids[idx], self.counts[idx]) for idx in top]
+
+        return sorted(self.top.items(), key=lambda x: x[1], reverse=True)[:k]
+
+STAT_KEYS = ("BUTTON_STATS", "TOPIC_STATS")
+
+def config_json() -> str:
+    return json.dumps({key: value for key, value in config.items() if key not in STAT_KEYS})
+
+def write_config(data: str):
     with open('config.json', 'w') as f:
-        json.dump(config, f)
+        f.write(data)
+
+def save_config():
+    write_config(config_json())
+
+config_write_lock = asyncio.Lock()
+
+async def save_config_async():
+    # Serialize on the loop so the thread never sees config mid-change; the lock keeps writes in order
+    data = config_json()
+    async with config_write_lock:
+        await asyncio.to_thread(write_config, data)
+
+def save_stats():
+    # Rewriting the stats files is O(n), so this runs from flush_stats instead of save_config
+    for key in STAT_KEYS:
+        if config[key].dirty:
+            config[key].save(config[f"{key}_FILE"])
+
+def load_stats(key: str) -> CounterStore:
+    stats_file = config[f"{key}_FILE"]
+    try:
+        return CounterStore.load(stats_file)
+    except FileNotFoundError:
+        # Stats used to live in config.json; migrate them on first start
+        stats = config[key]
+        return stats if isinstance(stats, CounterStore) else CounterStore.from_dict(stats)
+    except (EOFError, ValueError) as e:
+        logger.error(f"Stats file {stats_file} is damaged, moved it to {stats_file}.corrupt: {str(e)}")
+        os.replace(stats_file, stats_file + ".corrupt")
+        return CounterStore()
 
 def load_config():
     try:
         with open('config.json', 'r') as f:
             loaded_config = json.load(f)
             config.update(loaded_config)
-
-            if "BUTTON_STATS" in config:
-                config["BUTTON_STATS"] = {int(k): v for k, v in config["BUTTON_STATS"].items()}
-            else:
-                config["BUTTON_STATS"] = {}
-
-            if "TOPIC_STATS" in config:
-                config["TOPIC_STATS"] = {int(k): v for k, v in config["TOPIC_STATS"].items()}
-            else:
-                config["TOPIC_STATS"] = {}
     except FileNotFoundError:
-        save_config()
+        pass
 
-load_config()
+    for key in STAT_KEYS:
+        config[key] = load_stats(key)
+        config[key].rebuild_top()  # Pay for the full scan at startup rather than on the first /leaderboard
+
+    save_stats()
+    save_config()
 
 logging.basicConfig(
     level=logging.INFO,
@@ -78,10 +287,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger('discord')
 
-intents = discord.Intents.default()
-intents.message_content = True
-intents.members = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+load_config()
+
+bot = commands.Bot(command_prefix="!", **build_gateway_options(config["LEAN_GATEWAY"], config["CACHE_MEMBERS"]))
 
 def ping_role():
     return 1186948054838951976 if config[
@@ -108,21 +316,23 @@ class TopicManager:
             logger.error(f"Topics file {config['TOPICS_FILE']} not found")
             return []
 
-    def get_available_topics(self) -> list[str]:
+    def get_available_topics(self, all_topics: list[str] = None) -> list[str]:
         current_time = time.time()
         while self.used_topics and current_time - self.used_topics[0][1] > self.cooldown_seconds:
             self.used_topics.popleft()
 
         recent_topics = {topic for topic, _ in self.used_topics}
 
-        all_topics = self.load_topics()
+        if all_topics is None:
+            all_topics = self.load_topics()
         return [topic for topic in all_topics if topic not in recent_topics]
 
-    def get_random_topic(self) -> tuple[str, bool]:
-        available_topics = self.get_available_topics()
+    def get_random_topic(self, all_topics: list[str] = None) -> tuple[str, bool]:
+        if all_topics is None:
+            all_topics = self.load_topics()
+        available_topics = self.get_available_topics(all_topics)
 
         if not available_topics:
-            all_topics = self.load_topics()
             if not all_topics:
                 return "No topics available in topics.txt", False
 
@@ -136,14 +346,220 @@ class TopicManager:
         return topic, reused
 
 bot.topic_manager = TopicManager(config["TOPIC_COOLDOWN_HOURS"])
+bot.cooldowns = {}
+bot.user_names = OrderedDict()  # user_id -> (name, fetched_at), least recently used first
+USER_NAME_CACHE_SIZE = 1000
+USER_NAME_TTL_SECONDS = 24 * 3600
+bot.snapshot_button_message_id = None
+
+def save_snapshot():
+    current_time = time.time()
+    snapshot = {
+        "used_topics": [
+            [topic, used_at] for topic, used_at in bot.topic_manager.used_topics
+            if current_time - used_at <= bot.topic_manager.cooldown_seconds
+        ],
+        "cooldowns": {
+            user_id: timestamp.timestamp() for user_id, timestamp in bot.cooldowns.items()
+            if current_time - timestamp.timestamp() < config["COOLDOWN_SECONDS"]
+        },
+        "button_message_id": bot.ping_button_message.id if hasattr(bot, 'ping_button_message') else bot.snapshot_button_message_id,
+        "user_names": {
+            user_id: [name, fetched_at] for user_id, (name, fetched_at) in bot.user_names.items()
+            if current_time - fetched_at < USER_NAME_TTL_SECONDS
+        }
+    }
+
+    # Write to a temp file first so a crash mid-write never leaves a truncated snapshot
+    temp_file = config["SNAPSHOT_FILE"] + ".tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    os.replace(temp_file, config["SNAPSHOT_FILE"])
+
+def load_snapshot():
+    snapshot_file = config["SNAPSHOT_FILE"]
+    try:
+        with open(snapshot_file, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+
+        # Parse everything before touching bot state so a bad snapshot leaves the bot cold, not half-restored
+        current_time = time.time()
+        used_topics = [
+            (topic, used_at) for topic, used_at in snapshot.get("used_topics", [])
+            if current_time - used_at <= bot.topic_manager.cooldown_seconds
+        ]
+        cooldowns = {
+            int(user_id): datetime.fromtimestamp(timestamp)
+            for user_id, timestamp in snapshot.get("cooldowns", {}).items()
+            if current_time - timestamp < config["COOLDOWN_SECONDS"]
+        }
+        user_names = [
+            (int(user_id), (name, fetched_at)) for user_id, (name, fetched_at) in snapshot.get("user_names", {}).items()
+            if current_time - fetched_at < USER_NAME_TTL_SECONDS
+        ]
+        button_message_id = snapshot.get("button_message_id")
+    except FileNotFoundError:
+        return
+    except OSError as e:
+        logger.error(f"Could not read snapshot {snapshot_file}: {str(e)}")
+        return
+    except (ValueError, TypeError, IndexError, KeyError, AttributeError) as e:
+        logger.error(f"Snapshot {snapshot_file} is damaged, moved it to {snapshot_file}.corrupt: {str(e)}")
+        os.replace(snapshot_file, snapshot_file + ".corrupt")
+        return
+
+    bot.topic_manager.used_topics.extend(used_topics)
+    bot.cooldowns.update(cooldowns)
+    bot.user_names.update(user_names)
+    while len(bot.user_names) > USER_NAME_CACHE_SIZE:
+        bot.user_names.popitem(last=False)
+    bot.snapshot_button_message_id = button_message_id
+
+    logger.info(f"Loaded snapshot: {len(bot.topic_manager.used_topics)} recent topics, {len(bot.cooldowns)} cooldowns")
+
+load_snapshot()
+
+@tasks.loop(minutes=5)
+async def snapshot_state():
+    try:
+        save_snapshot()
+    except Exception as e:
+        logger.error(f"Error saving snapshot: {str(e)}")
+
+@tasks.loop(seconds=60)  # Interval is set from STATS_FLUSH_SECONDS in on_ready
+async def flush_stats():
+    try:
+        save_stats()
+    except Exception as e:
+        logger.error(f"Error saving stats: {str(e)}")
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    # Nearest-rank percentile of an already sorted, non-empty list
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+async def get_username(user_id: int) -> str:
+    cached = bot.user_names.get(user_id)
+    if cached and time.time() - cached[1] < USER_NAME_TTL_SECONDS:
+        bot.user_names.move_to_end(user_id)
+        return cached[0]
+
+    try:
+        user = bot.get_user(user_id) or await bot.fetch_user(user_id)
+    except discord.HTTPException:
+        # Better a stale name than none while Discord is unreachable
+        return cached[0] if cached else f"Unknown User ({user_id})"
+
+    bot.user_names[user_id] = (user.name, time.time())
+    bot.user_names.move_to_end(user_id)
+    if len(bot.user_names) > USER_NAME_CACHE_SIZE:
+        bot.user_names.popitem(last=False)
+    return user.name
+
+ACK_DEADLINE_SECONDS = 3.0  # Discord drops interactions that are not acknowledged in time
+ACK_WARNING_SECONDS = 2.0
+
+class InteractionWorkers:
+    def __init__(self, worker_count: int, queue_size: int):
+        self.worker_count = worker_count
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.tasks = []
+        self.ack_latencies = deque(maxlen=1000)
+
+    def start(self):
+        self.tasks = [task for task in self.tasks if not task.done()]
+        for idx in range(len(self.tasks), self.worker_count):
+            self.tasks.append(asyncio.create_task(self.worker(), name=f"interaction-worker-{idx}"))
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def worker(self):
+        while True:
+            name, interaction, work, error_message = await self.queue.get()
+            try:
+                await work()
+            except Exception as e:
+                logger.error(f"Error in {name} command: {str(e)}")
+                try:
+                    await interaction.followup.send(error_message, ephemeral=True)
+                except Exception:
+                    pass
+            finally:
+                self.queue.task_done()
+
+    async def submit(self, name: str, interaction: discord.Interaction, work, error_message: str) -> bool:
+        # A full queue makes callers wait here instead of piling up unbounded work
+        try:
+            await asyncio.wait_for(
+                self.queue.put((name, interaction, work, error_message)),
+                timeout=config["WORK_QUEUE_TIMEOUT_SECONDS"]
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Work queue full, dropped {name} for {interaction.user.name}")
+            return False
+        return True
+
+    def record_ack(self, interaction: discord.Interaction, name: str = None):
+        elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+        self.ack_latencies.append(elapsed)
+        if elapsed > ACK_WARNING_SECONDS:
+            name = name or (interaction.command.name if interaction.command else "interaction")
+            logger.warning(f"{name} acknowledged after {elapsed:.2f}s ({ACK_DEADLINE_SECONDS - elapsed:.2f}s before deadline)")
+
+    def summary(self) -> list[str]:
+        lines = [f"Work queue: {self.queue.qsize()}/{self.queue.maxsize}, {len(self.tasks)} workers"]
+        if self.ack_latencies:
+            latencies = sorted(self.ack_latencies)
+            lines.append(
+                f"Ack latency ({len(latencies)} interactions): "
+                f"p50 {percentile(latencies, 0.5) * 1000:.0f}ms, "
+                f"p95 {percentile(latencies, 0.95) * 1000:.0f}ms, "
+                f"max {latencies[-1] * 1000:.0f}ms, "
+                f"{sum(1 for latency in latencies if latency > ACK_WARNING_SECONDS)} over {ACK_WARNING_SECONDS:.0f}s"
+            )
+        return lines
+
+bot.workers = InteractionWorkers(config["WORKER_COUNT"], config["WORK_QUEUE_SIZE"])
+
+# Every first response goes through acknowledge or respond so each interaction's ack time is recorded
+async def acknowledge(interaction: discord.Interaction, name: str = None, *, ephemeral=False, thinking=False):
+    if interaction.response.is_done():
+        return
+    await interaction.response.defer(ephemeral=ephemeral, thinking=thinking)
+    interaction.extras["ephemeral_ack"] = ephemeral
+    bot.workers.record_ack(interaction, name)
+
+async def respond(interaction: discord.Interaction, content: str, ephemeral=False):
+    if not interaction.response.is_done():
+        await interaction.response.send_message(content, ephemeral=ephemeral)
+        bot.workers.record_ack(interaction)
+    elif not ephemeral and interaction.extras.get("ephemeral_ack"):
+        # A followup would inherit the private defer, so post the public reply in the channel instead
+        await interaction.channel.send(content)
+        await interaction.delete_original_response()
+    else:
+        await interaction.followup.send(content, ephemeral=ephemeral)
+
+async def ack_then_run(interaction: discord.Interaction, name: str, work, *, ephemeral=False,
+                       error_message="An error occurred. Please try again."):
+    await acknowledge(interaction, name, ephemeral=ephemeral, thinking=True)
+
+    if not await bot.workers.submit(name, interaction, work, error_message):
+        await interaction.followup.send("TreeBot is busy right now. Please try again in a moment.", ephemeral=True)
 
 async def has_required_role(interaction: discord.Interaction):
-    member = interaction.guild.get_member(interaction.user.id)
+    member = interaction.user if isinstance(interaction.user, discord.Member) else interaction.guild.get_member(interaction.user.id)
     if member is None:
+        # Fetching the member can be slow, so acknowledge the interaction first. The defer is private
+        # so a denial stays private; public replies go through respond().
+        await acknowledge(interaction, ephemeral=True, thinking=True)
         member = await interaction.guild.fetch_member(interaction.user.id)
 
     if not any(role.id in cmd_role() for role in member.roles):
-        await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
+        await respond(interaction, "You do not have permission to use this command.", ephemeral=True)
         return False
     return True
 
@@ -170,13 +586,13 @@ class ConfirmView(View):
 
     @discord.ui.button(label="Confirm Ping", style=discord.ButtonStyle.danger)
     async def confirm(self, interaction: discord.Interaction, button: Button):
-        await interaction.response.defer(ephemeral=True)
+        await acknowledge(interaction, "confirm", ephemeral=True)
         self.value = True
         self.stop()
         self.user_id = interaction.user.id
 
         config["BUTTON_STATS"][interaction.user.id] = config["BUTTON_STATS"].get(interaction.user.id, 0) + 1
-        save_config()
+        await save_config_async()
 
         logger.info(f"{interaction.user.name} confirm")
         await self.delete_confirmation_message()
@@ -184,7 +600,7 @@ class ConfirmView(View):
 
     @discord.ui.button(label="Cancel", style=discord.ButtonStyle.secondary)
     async def cancel(self, interaction: discord.Interaction, button: Button):
-        await interaction.response.defer(ephemeral=True)
+        await acknowledge(interaction, "cancel", ephemeral=True)
         self.value = False
         self.stop()
         logger.info(f"{interaction.user.name} cancel")
@@ -195,12 +611,12 @@ class PingButton(View):
     def __init__(self):
         super().__init__(timeout=None)
         self.previous_confirmation_messages = {}
-        self.cooldowns = {}
+        self.cooldowns = bot.cooldowns  # Shared by every PingButton instance and kept in the snapshot
 
     @discord.ui.button(label="Ping Tree Role", style=discord.ButtonStyle.danger, custom_id="ping_tree_button")
     async def ping_tree(self, interaction: discord.Interaction, button: Button):
         try:
-            await interaction.response.defer(ephemeral=True)
+            await acknowledge(interaction, "ping", ephemeral=True)
             logger.info(f"{interaction.user.name} ping")
 
             if interaction.user.id in config["BANNED_USERS"]:
@@ -265,11 +681,13 @@ class PingButton(View):
 
     async def cleanup_cooldowns(self):
         current_time = datetime.now()
-        self.cooldowns = {
-            user_id: timestamp
+        expired = [
+            user_id
             for user_id, timestamp in self.cooldowns.items()
-            if (current_time - timestamp).total_seconds() < config["COOLDOWN_SECONDS"]
-        }
+            if (current_time - timestamp).total_seconds() >= config["COOLDOWN_SECONDS"]
+        ]
+        for user_id in expired:
+            del self.cooldowns[user_id]
 
 class LeaderboardView(View):
     def __init__(self, user_stats, page=0, stat_type="button"):
@@ -281,28 +699,28 @@ class LeaderboardView(View):
 
     @discord.ui.button(label="Button Stats", style=discord.ButtonStyle.primary)
     async def button_stats(self, interaction: discord.Interaction, button: Button):
-        await interaction.response.defer(ephemeral=False)
+        await acknowledge(interaction, "leaderboard page")
         self.stat_type = "button"
         self.page = 0
         await self.update_leaderboard(interaction)
 
     @discord.ui.button(label="Topic Stats", style=discord.ButtonStyle.primary)
     async def topic_stats(self, interaction: discord.Interaction, button: Button):
-        await interaction.response.defer(ephemeral=False)
+        await acknowledge(interaction, "leaderboard page")
         self.stat_type = "topic"
         self.page = 0
         await self.update_leaderboard(interaction)
 
     @discord.ui.button(label="⬅️ Previous", style=discord.ButtonStyle.secondary)
     async def previous_page(self, interaction: discord.Interaction, button: Button):
-        await interaction.response.defer(ephemeral=False)
+        await acknowledge(interaction, "leaderboard page")
         if self.page > 0:
             self.page -= 1
         await self.update_leaderboard(interaction)
 
     @discord.ui.button(label="Next ➡️", style=discord.ButtonStyle.secondary)
     async def next_page(self, interaction: discord.Interaction, button: Button):
-        await interaction.response.defer(ephemeral=False)
+        await acknowledge(interaction, "leaderboard page")
         if self.page < self.max_page:
             self.page += 1
         await self.update_leaderboard(interaction)
@@ -310,13 +728,11 @@ class LeaderboardView(View):
     async def update_leaderboard(self, interaction: discord.Interaction):
         stats_data = config["BUTTON_STATS"] if self.stat_type == "button" else config["TOPIC_STATS"]
 
-        stats_list = sorted(stats_data.items(), key=lambda x: x[1], reverse=True)
-
-        self.max_page = max(0, (len(stats_list) - 1) // 10)
+        self.max_page = max(0, (len(stats_data) - 1) // 10)
 
         start_idx = self.page * 10
-        end_idx = min(start_idx + 10, len(stats_list))
-        current_entries = stats_list[start_idx:end_idx]
+        end_idx = min(start_idx + 10, len(stats_data))
+        current_entries = stats_data.top_k(end_idx)[start_idx:end_idx]
 
         embed = discord.Embed(
             title=f"Tree Bot {'Button' if self.stat_type == 'button' else 'Topic'} Leaderboard",
@@ -325,11 +741,7 @@ class LeaderboardView(View):
         )
 
         for idx, (user_id, count) in enumerate(current_entries, start=start_idx + 1):
-            try:
-                user = await bot.fetch_user(user_id)
-                username = user.name
-            except:
-                username = f"Unknown User ({user_id})"
+            username = await get_username(user_id)
 
             embed.add_field(
                 name=f"{idx}. {username}",
@@ -369,8 +781,7 @@ async def addallowedrole(interaction: discord.Interaction, role_id: str):
         role_ids = config.get("ROLE_IDS", [])
 
         if role_id_int in role_ids:
-            await interaction.response.send_message(f"Role ID {role_id} is already in the allowed roles list.",
-                                                    ephemeral=True)
+            await respond(interaction, f"Role ID {role_id} is already in the allowed roles list.", ephemeral=True)
             return
 
         role_ids.append(role_id_int)
@@ -378,11 +789,10 @@ async def addallowedrole(interaction: discord.Interaction, role_id: str):
         config["ROLE_IDS"] = role_ids
 
         logger.info(f"{interaction.user.name} added role: {role_id}")
-        await interaction.response.send_message(f"Added role ID {role_id} to the allowed roles list.", ephemeral=True)
+        await respond(interaction, f"Added role ID {role_id} to the allowed roles list.", ephemeral=True)
 
     except ValueError:
-        await interaction.response.send_message("Invalid role ID format. Please provide a valid number.",
-                                                ephemeral=True)
+        await respond(interaction, "Invalid role ID format. Please provide a valid number.", ephemeral=True)
 
 @bot.tree.command(name="removeallowedrole", description="Remove a role from the list of roles allowed to use the bot")
 async def removeallowedrole(interaction: discord.Interaction, role_id: str):
@@ -397,8 +807,7 @@ async def removeallowedrole(interaction: discord.Interaction, role_id: str):
         role_ids = cmd_role()
 
         if role_id_int not in role_ids:
-            await interaction.response.send_message(f"Role ID {role_id} is not in the allowed roles list.",
-                                                    ephemeral=True)
+            await respond(interaction, f"Role ID {role_id} is not in the allowed roles list.", ephemeral=True)
             return
 
         role_ids.remove(role_id_int)
@@ -407,40 +816,36 @@ async def removeallowedrole(interaction: discord.Interaction, role_id: str):
             return role_ids
 
         logger.info(f"{interaction.user.name} removed role: {role_id}")
-        await interaction.response.send_message(f"Removed role ID {role_id} from allowed roles list.", ephemeral=True)
+        await respond(interaction, f"Removed role ID {role_id} from allowed roles list.", ephemeral=True)
 
     except ValueError:
-        await interaction.response.send_message("Invalid role ID format. Please provide a valid number.",
-                                                ephemeral=True)
+        await respond(interaction, "Invalid role ID format. Please provide a valid number.", ephemeral=True)
 
 @bot.tree.command(name="topic", description="Get a random discussion topic")
 async def get_topic(interaction: discord.Interaction):
-    try:
-        topic, _ = bot.topic_manager.get_random_topic()
+    async def work():
+        all_topics = await asyncio.to_thread(bot.topic_manager.load_topics)
+        topic, _ = bot.topic_manager.get_random_topic(all_topics)
 
         config["TOPIC_STATS"][interaction.user.id] = config["TOPIC_STATS"].get(interaction.user.id, 0) + 1
-        save_config()
 
-        await interaction.response.send_message(f"{topic}")
+        await interaction.followup.send(f"{topic}")
 
         logger.info(f"{interaction.user.name} used topic")
+        await save_config_async()
 
-    except Exception as e:
-        logger.error(f"Error in topic command: {str(e)}")
-        await interaction.response.send_message(
-            "An error occurred while getting a topic. Please try again.",
-            ephemeral=True
-        )
+    await ack_then_run(interaction, "topic", work,
+                       error_message="An error occurred while getting a topic. Please try again.")
 
 @bot.tree.command(name="leaderboard", description="Show TreeBot leaderboard")
 async def show_leaderboard(interaction: discord.Interaction):
-    try:
-        logger.info(f"{interaction.user.name} used leaderboard")
+    logger.info(f"{interaction.user.name} used leaderboard")
 
+    async def work():
         button_stats = config["BUTTON_STATS"]
-        sorted_stats = sorted(button_stats.items(), key=lambda x: x[1], reverse=True)
+        sorted_stats = button_stats.top_k(10)
 
-        view = LeaderboardView(sorted_stats)
+        view = LeaderboardView(button_stats)
 
         embed = discord.Embed(
             title="Tree Bot Button Leaderboard",
@@ -448,12 +853,8 @@ async def show_leaderboard(interaction: discord.Interaction):
             color=0x2ECC71
         )
 
-        for idx, (user_id, count) in enumerate(sorted_stats[:10], start=1):
-            try:
-                user = await bot.fetch_user(user_id)
-                username = user.name
-            except:
-                username = f"Unknown User ({user_id})"
+        for idx, (user_id, count) in enumerate(sorted_stats, start=1):
+            username = await get_username(user_id)
 
             embed.add_field(
                 name=f"{idx}. {username}",
@@ -461,14 +862,10 @@ async def show_leaderboard(interaction: discord.Interaction):
                 inline=False
             )
 
-        await interaction.response.send_message(embed=embed, view=view)
+        await interaction.followup.send(embed=embed, view=view)
 
-    except Exception as e:
-        logger.error(f"Error in leaderboard command: {str(e)}")
-        await interaction.response.send_message(
-            "An error occurred while getting the leaderboard. Please try again.",
-            ephemeral=True
-        )
+    await ack_then_run(interaction, "leaderboard", work,
+                       error_message="An error occurred while getting the leaderboard. Please try again.")
 
 @bot.tree.command(name="toggletestmode", description="Toggle test mode on/off")
 async def toggle_test_mode(interaction: discord.Interaction):
@@ -478,16 +875,17 @@ async def toggle_test_mode(interaction: discord.Interaction):
             await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
         return
 
-    config["TEST_MODE"] = not config["TEST_MODE"]
-    save_config()
-    mode_status = "enabled" if config["TEST_MODE"] else "disabled"
+    async def work():
+        config["TEST_MODE"] = not config["TEST_MODE"]
+        mode_status = "enabled" if config["TEST_MODE"] else "disabled"
 
-    logger.info(f"{interaction.user.name} test mode {mode_status}")
+        logger.info(f"{interaction.user.name} test mode {mode_status}")
 
-    await update_button_message()
+        await save_config_async()
+        await update_button_message()
+        await respond(interaction, f"Test mode {mode_status}")
 
-    if not interaction.response.is_done():
-        await interaction.response.send_message(f"Test mode {mode_status}", ephemeral=False)
+    await ack_then_run(interaction, "toggletestmode", work, ephemeral=True)
 
 @bot.tree.command(name="ban", description="Ban a user from using the tree bot")
 async def ban_user(interaction: discord.Interaction, user: discord.User):
@@ -499,19 +897,20 @@ async def ban_user(interaction: discord.Interaction, user: discord.User):
             await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
         return
 
-    if user.id not in config["BANNED_USERS"]:
-        config["BANNED_USERS"].append(user.id)
-        save_config()
+    async def work():
+        if user.id not in config["BANNED_USERS"]:
+            config["BANNED_USERS"].append(user.id)
+            await save_config_async()
 
-        logger.info(f"{interaction.user.name} banned {user.name}")
+            logger.info(f"{interaction.user.name} banned {user.name}")
 
-        if not interaction.response.is_done():
-            await interaction.response.send_message(f"Banned {user.name} from using the tree bot", ephemeral=False)
-    else:
-        logger.info(f"{interaction.user.name} tried to ban {user.name}, but they are already banned.")
+            await respond(interaction, f"Banned {user.name} from using the tree bot")
+        else:
+            logger.info(f"{interaction.user.name} tried to ban {user.name}, but they are already banned.")
 
-        if not interaction.response.is_done():
-            await interaction.response.send_message(f"{user.name} is already banned", ephemeral=False)
+            await respond(interaction, f"{user.name} is already banned")
+
+    await ack_then_run(interaction, "ban", work, ephemeral=True)
 
 @bot.tree.command(name="unban", description="Unban a user from the tree bot")
 async def unban_user(interaction: discord.Interaction, user: discord.User):
@@ -522,39 +921,125 @@ async def unban_user(interaction: discord.Interaction, user: discord.User):
             await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
         return
 
-    if user.id in config["BANNED_USERS"]:
-        config["BANNED_USERS"].remove(user.id)
-        save_config()
+    async def work():
+        if user.id in config["BANNED_USERS"]:
+            config["BANNED_USERS"].remove(user.id)
+            await save_config_async()
 
-        logger.info(f"{interaction.user.name} unbanned {user.name}")
+            logger.info(f"{interaction.user.name} unbanned {user.name}")
 
-        if not interaction.response.is_done():
-            await interaction.response.send_message(f"Unbanned {user.name} from the tree bot", ephemeral=False)
-    else:
-        logger.info(f"{interaction.user.name} tried to unban {user.name}, but they are not banned.")
+            await respond(interaction, f"Unbanned {user.name} from the tree bot")
+        else:
+            logger.info(f"{interaction.user.name} tried to unban {user.name}, but they are not banned.")
 
-        if not interaction.response.is_done():
-            await interaction.response.send_message(f"{user.name} is not banned", ephemeral=False)
+            await respond(interaction, f"{user.name} is not banned")
+
+    await ack_then_run(interaction, "unban", work, ephemeral=True)
 
 @bot.tree.command(name="listbanned", description="List all banned users")
 async def list_banned(interaction: discord.Interaction):
     logger.info(f"{interaction.user.name} used listbanned")
 
     if not config["BANNED_USERS"]:
-        await interaction.response.send_message("No users are currently banned", ephemeral=False)
+        await respond(interaction, "No users are currently banned", ephemeral=False)
         return
 
-    banned_users = []
-    for user_id in config["BANNED_USERS"]:
-        try:
-            user = await bot.fetch_user(user_id)
-            banned_users.append(f"- {user.name} ({user_id})")
-        except:
-            banned_users.append(f"- Unknown User ({user_id})")
-
-    await interaction.response.send_message(
-        "Banned users:\n" + "\n".join(banned_users),
-        ephemeral=False
+    async def work():
+        banned_users = []
+        for user_id in config["BANNED_USERS"]:
+            banned_users.append(f"- {await get_username(user_id)} ({user_id})")
+
+        await interaction.followup.send("Banned users:\n" + "\n".join(banned_users))
+
+    await ack_then_run(interaction, "listbanned", work)
+
+def coroutine_chain(coro) -> list:
+    chain = []
+    while coro is not None:
+        chain.append(coro)
+        coro = getattr(coro, 'cr_await', None) or getattr(coro, 'gi_yieldfrom', None)
+    return chain
+
+def dump_tasks() -> list[str]:
+    lines = []
+    waiting_pings = 0
+    tasks_running = asyncio.all_tasks()
+    for task in tasks_running:
+        chain = coroutine_chain(task.get_coro())
+        # Match code objects, qualnames differ between discord.py versions (View.wait vs BaseView.wait)
+        codes = {getattr(coro, 'cr_code', None) for coro in chain}
+        if PingButton.ping_tree.__code__ in codes and View.wait.__code__ in codes:
+            waiting_pings += 1
+        names = [coro.__qualname__ for coro in chain if hasattr(coro, '__qualname__')]
+        lines.append(f"{task.get_name()}: {' -> '.join(names) or repr(task.get_coro())}")
+
+    return [
+        f"Live tasks: {len(tasks_running)}",
+        f"ping_tree waiting in view.wait(): {waiting_pings}",
+        ""
+    ] + sorted(lines)
+
+async def sample_loop_lag(samples: list[float], interval: float = 0.1):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - start - interval)
+
+@bot.tree.command(name="debugprofile", description="Profile the bot for a number of seconds")
+async def debug_profile(interaction: discord.Interaction, seconds: int):
+    if not await has_required_role(interaction):
+        logger.info(f"{interaction.user.name} attempted: debugprofile {seconds}")
+        if not interaction.response.is_done():
+            await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
+        return
+
+    if not 1 <= seconds <= 300:
+        await respond(interaction, "Seconds must be between 1 and 300.", ephemeral=True)
+        return
+
+    if getattr(bot, 'profiling', False):
+        await respond(interaction, "A profile is already running.", ephemeral=True)
+        return
+
+    await acknowledge(interaction, ephemeral=True)
+    logger.info(f"{interaction.user.name} started debugprofile for {seconds}s")
+
+    bot.profiling = True
+    lag_samples = []
+    lag_task = asyncio.create_task(sample_loop_lag(lag_samples))
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+        lag_task.cancel()
+        bot.profiling = False
+
+    report = [f"TreeBot profile: {seconds}s, {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ""]
+
+    if lag_samples:
+        lag_sorted = sorted(lag_samples)
+        report += [
+            f"Event loop lag ({len(lag_sorted)} samples):",
+            f"  mean {sum(lag_sorted) / len(lag_sorted) * 1000:.1f}ms, "
+            f"p95 {percentile(lag_sorted, 0.95) * 1000:.1f}ms, "
+            f"max {lag_sorted[-1] * 1000:.1f}ms",
+            ""
+        ]
+
+    report += bot.workers.summary() + [""]
+    report += dump_tasks() + [""]
+
+    stats_output = io.StringIO()
+    pstats.Stats(profiler, stream=stats_output).sort_stats("cumulative").print_stats(50)
+    report.append(stats_output.getvalue())
+
+    await interaction.followup.send(
+        "Profile finished.",
+        file=discord.File(io.BytesIO("\n".join(report).encode()), filename="profile.txt"),
+        ephemeral=True
     )
 
 @bot.event
@@ -576,13 +1061,30 @@ async def on_ready():
     if not check_connection.is_running():
         check_connection.start()
 
+    if not snapshot_state.is_running():
+        snapshot_state.start()
+
+    if not flush_stats.is_running():
+        flush_stats.change_interval(seconds=config["STATS_FLUSH_SECONDS"])
+        flush_stats.start()
+
+    bot.workers.start()
+
     channel = bot.get_channel(BUTTON_DESTINATION)
     if channel:
         existing_button = None
-        async for message in channel.history(limit=100):
-            if message.author == bot.user and "Click this button to ping `@tree` role" in message.content:
-                existing_button = message
-                break
+        if bot.snapshot_button_message_id:
+            try:
+                existing_button = await channel.fetch_message(bot.snapshot_button_message_id)
+            except discord.HTTPException as e:
+                logger.info(f"Could not fetch button message from snapshot, searching channel history: {str(e)}")
+            bot.snapshot_button_message_id = None
+
+        if existing_button is None:
+            async for message in channel.history(limit=100):
+                if message.author == bot.user and "Click this button to ping `@tree` role" in message.content:
+                    existing_button = message
+                    break
 
         if existing_button:
             bot.ping_button_message = existing_button
@@ -677,6 +1179,22 @@ async def cleanup():
         if switch_activity.is_running():
             switch_activity.cancel()
 
+        if flush_stats.is_running():
+            flush_stats.cancel()
+        try:
+            save_stats()
+        except Exception as e:
+            logger.error(f"Error saving stats: {str(e)}")
+
+        if snapshot_state.is_running():
+            snapshot_state.cancel()
+        try:
+            save_snapshot()
+        except Exception as e:
+            logger.error(f"Error saving snapshot: {str(e)}")
+
+        await bot.workers.stop()
+
         cleanup_tasks = []
 
         if not bot.is_closed():
@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+import discord
+from discord.state import ConnectionState
+from gateway import build_gateway_options
+
+def fake_member(member_id: int):
+    return {
+        "user": {
+            "id": str(member_id),
+            "username": f"user{member_id}",
+            "discriminator": "0",
+            "global_name": None,
+            "avatar": None
+        },
+        "nick": None,
+        "roles": [str(member_id % 20 + 1)],
+        "joined_at": "2024-01-01T00:00:00+00:00",
+        "deaf": False,
+        "mute": False,
+        "flags": 0
+    }
+
+def fake_guild(guild_id: int, member_count: int):
+    return {
+        "id": str(guild_id),
+        "name": "Simulated guild",
+        "owner_id": "1",
+        "member_count": member_count,
+        "large": True,
+        "roles": [
+            {"id": str(role_id), "name": f"role{role_id}", "permissions": "0", "position": role_id, "color": 0,
+             "hoist": False, "managed": False, "mentionable": False}
+            for role_id in range(1, 21)
+        ],
+        "channels": [
+            {"id": str(guild_id + channel_id), "type": 0, "name": f"channel{channel_id}", "position": channel_id,
+             "permission_overwrites": []}
+            for channel_id in range(1, 51)
+        ],
+        "members": [],
+        "emojis": [],
+        "stickers": [],
+        "features": []
+    }
+
+async def run_startup(setup, member_count: int, chunk_size: int, active_members: int):
+    state = ConnectionState(dispatch=lambda *args, **kwargs: None, handlers={}, hooks={}, http=None, **setup)
+    state.loop = asyncio.get_running_loop()
+    state.clear()
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    guild = state._add_guild_from_data(fake_guild(10_000_000, member_count))
+
+    # Replays what GUILD_MEMBERS_CHUNK does when the guild is chunked at startup
+    if state._guild_needs_chunking(guild):
+        cache = state.member_cache_flags.joined
+        for chunk_start in range(0, member_count, chunk_size):
+            chunk_end = min(chunk_start + chunk_size, member_count)
+            members = [
+                discord.Member(data=fake_member(member_id), guild=guild, state=state)
+                for member_id in range(100 + chunk_start, 100 + chunk_end)
+            ]
+            if cache:
+                for member in members:
+                    guild._add_member(member)
+
+    # Members who talk, change roles or nicknames afterwards. Without the members intent these
+    # events never arrive; with it, unchunked setups cache each member on first sight.
+    if state._intents.members:
+        for member_id in range(100, 100 + active_members):
+            state.parse_guild_member_update(dict(fake_member(member_id), guild_id=str(guild.id)))
+
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "members_cached": len(guild._members),
+        "users_cached": len(state._users),
+        "seconds": elapsed,
+        "current_mb": current / 1024 / 1024,
+        "peak_mb": peak / 1024 / 1024
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare TreeBot gateway cache setups on a simulated large guild")
+    parser.add_argument("--members", type=int, default=250_000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--active-members", type=int, default=25_000)
+    args = parser.parse_args()
+
+    setups = {
+        "current": build_gateway_options(lean=False, cache_members=False),
+        "lean": build_gateway_options(lean=True, cache_members=False),
+        "lean+members": build_gateway_options(lean=True, cache_members=True)
+    }
+
+    print(f"Simulated guild with {args.members} members, {args.active_members} of them active")
+    print(f"{'setup':<14}{'members':>10}{'users':>10}{'seconds':>12}{'current MB':>12}{'peak MB':>10}")
+    for name, setup in setups.items():
+        result = await run_startup(setup, args.members, args.chunk_size, args.active_members)
+        print(
+            f"{name:<14}{result['members_cached']:>10}{result['users_cached']:>10}"
+            f"{result['seconds']:>12.3f}{result['current_mb']:>12.1f}{result['peak_mb']:>10.1f}"
+        )
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,31 @@
+import discord
+
+# Kept out of TreeBotMain.py so bench_gateway_cache.py can build the same setups without a token.
+
+def build_intents(lean: bool, cache_members: bool) -> discord.Intents:
+    if not lean:
+        intents = discord.Intents.default()
+        intents.message_content = True
+        intents.members = True
+        return intents
+
+    # Interactions carry the clicking member and its roles, and the bot always sees the
+    # content of its own messages, so guilds is the only intent the bot really needs.
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.members = cache_members
+    return intents
+
+def build_member_cache_flags(intents: discord.Intents, lean: bool, cache_members: bool) -> discord.MemberCacheFlags:
+    if lean and not cache_members:
+        return discord.MemberCacheFlags.none()
+    return discord.MemberCacheFlags.from_intents(intents)
+
+def build_gateway_options(lean: bool, cache_members: bool) -> dict:
+    intents = build_intents(lean, cache_members)
+    return {
+        "intents": intents,
+        "member_cache_flags": build_member_cache_flags(intents, lean, cache_members),
+        "chunk_guilds_at_startup": not lean,
+        "max_messages": None if lean else 1000
+    }